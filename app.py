@@ -1,37 +1,86 @@
 """Flask application for Video Transcriber."""
 
-import json
+import errno
 import os
-import re
 import shutil
-
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+
+import msgpack
+import orjson
 from dotenv import load_dotenv
-from flask import Flask, flash, jsonify, redirect, render_template, request, send_file, url_for
-from markupsafe import Markup
+from flask import (
+    Flask, Request, Response, current_app, flash, jsonify, redirect, render_template, request,
+    send_file, url_for,
+)
+from markupsafe import Markup, escape
+from sqlalchemy import event
 
 from werkzeug.utils import secure_filename
 
-from models import Video, db
-from transcription import VIDEO_EXTENSIONS, get_video_duration, scan_folder
+from models import Video, clear_segments, db, index_segments
+from transcription import VIDEO_EXTENSIONS, format_timestamp, get_video_duration, scan_folder
 from worker import start_processing, stop_processing
 
 load_dotenv()
 
 
+def _set_sqlite_pragmas(dbapi_conn, _connection_record):
+    """Tune each new SQLite connection.
+
+    WAL lets the dashboard read while the worker is committing, and
+    synchronous=NORMAL is safe under WAL while skipping an fsync per commit.
+    """
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA mmap_size=268435456")
+    cur.execute("PRAGMA cache_size=-64000")
+    cur.close()
+
+
+class _UploadRequest(Request):
+    """Request that spools file uploads into uploads/ instead of the system temp dir.
+
+    Keeping the spooled file on the same filesystem as its destination lets
+    _save_upload() hard-link it into place rather than copy it a second time.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        upload_dir = os.path.join(current_app.root_path, "uploads")
+        os.makedirs(upload_dir, exist_ok=True)
+        return tempfile.NamedTemporaryFile(
+            "wb+", dir=upload_dir, prefix=".upload-", suffix=".part"
+        )
+
+
 def create_app():
     app = Flask(__name__)
+    app.request_class = _UploadRequest
     app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "dev-secret-change-me")
+    app.config["UPLOAD_BUFFER_SIZE"] = 1024 * 1024
+    if os.environ.get("MAX_UPLOAD_MB"):
+        app.config["MAX_CONTENT_LENGTH"] = int(os.environ["MAX_UPLOAD_MB"]) * 1024 * 1024
     app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///videos.db"
     db.init_app(app)
 
     with app.app_context():
+        event.listen(db.engine, "connect", _set_sqlite_pragmas)
         db.create_all()
         # Add new columns if they don't exist (SQLite migration)
-        import sqlite3
         db_path = os.path.join(app.instance_path, "videos.db")
         if os.path.exists(db_path):
             conn = sqlite3.connect(db_path)
-            for col in ["report_path TEXT", "screenshots_json TEXT", "output_dir TEXT"]:
+            for col in [
+                "report_path TEXT", "screenshots_json TEXT", "output_dir TEXT",
+                "segments_blob BLOB", "updated_at DATETIME",
+            ]:
                 try:
                     conn.execute(f"ALTER TABLE video ADD COLUMN {col}")
                 except sqlite3.OperationalError:
@@ -39,24 +88,88 @@ def create_app():
             conn.commit()
             conn.close()
 
+        # create_all() skips indexes on tables that already exist
+        db.session.execute(db.text(
+            "CREATE INDEX IF NOT EXISTS ix_video_status_created ON video (status, created_at)"
+        ))
+        db.session.execute(db.text(
+            "CREATE INDEX IF NOT EXISTS ix_video_created ON video (created_at)"
+        ))
+        db.session.execute(db.text(
+            "CREATE INDEX IF NOT EXISTS ix_video_updated ON video (updated_at)"
+        ))
+        # Rows from before updated_at existed
+        db.session.execute(db.text(
+            "UPDATE video SET updated_at = COALESCE(processed_at, created_at) "
+            "WHERE updated_at IS NULL"
+        ))
+        db.session.commit()
+
+        # Segments are stored as msgpack now; convert rows saved as JSON text
+        legacy = Video.query.options(db.undefer_group("transcript")).filter(
+            Video.segments_json.isnot(None), Video.segments_blob.is_(None)
+        )
+        for video in legacy:
+            video.segments_blob = msgpack.packb(orjson.loads(video.segments_json))
+            video.segments_json = None
+        db.session.commit()
+
+        # Full-text index over transcript segments. Backfill it the first time
+        # it is created so transcripts from before the index stay searchable.
+        fts_exists = db.session.execute(db.text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'segment_fts'"
+        )).first()
+        if not fts_exists:
+            db.session.execute(db.text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS segment_fts USING fts5("
+                "video_id UNINDEXED, seg_index UNINDEXED, start UNINDEXED, text, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            ))
+            indexed = Video.query.options(db.undefer_group("transcript")).filter(
+                Video.segments_blob.isnot(None)
+            )
+            for video in indexed:
+                index_segments(video.id, msgpack.unpackb(video.segments_blob))
+            db.session.commit()
+
     return app
 
 
 app = create_app()
 
 
+def _status_counts():
+    """Return the number of videos in each status using a single GROUP BY."""
+    rows = db.session.execute(
+        db.select(Video.status, db.func.count()).group_by(Video.status)
+    ).all()
+    return {"done": 0, "processing": 0, "pending": 0, "failed": 0} | dict(rows)
+
+
 @app.route("/")
 def index():
     videos = Video.query.order_by(Video.created_at.desc()).all()
-    counts = {
-        "done": Video.query.filter_by(status="done").count(),
-        "processing": Video.query.filter_by(status="processing").count(),
-        "pending": Video.query.filter_by(status="pending").count(),
-        "failed": Video.query.filter_by(status="failed").count(),
-    }
+    counts = _status_counts()
     return render_template("index.html", videos=videos, counts=counts)
 
 
+def _existing_filepaths(paths):
+    """Return the subset of *paths* already in the database, in one query."""
+    if not paths:
+        return set()
+    return set(db.session.scalars(
+        db.select(Video.filepath).where(Video.filepath.in_(paths))
+    ).all())
+
+
+def _probe_durations(paths):
+    """Run ffprobe on *paths* concurrently and return {path: duration}."""
+    if not paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(8, len(paths))) as pool:
+        return dict(zip(paths, pool.map(get_video_duration, paths)))
+
+
 @app.route("/scan", methods=["POST"])
 def scan():
     folder = request.form.get("folder", "").strip()
@@ -74,22 +187,21 @@ def scan():
         flash("No video files found in that folder.", "warning")
         return redirect(url_for("index"))
 
-    added = 0
-    for filepath in paths:
-        existing = Video.query.filter_by(filepath=filepath).first()
-        if existing:
-            continue
-        video = Video(
+    existing = _existing_filepaths(paths)
+    new_paths = [p for p in paths if p not in existing]
+    durations = _probe_durations(new_paths)
+    db.session.add_all([
+        Video(
             filename=os.path.basename(filepath),
             filepath=filepath,
             folder=folder,
-            duration_seconds=get_video_duration(filepath),
+            duration_seconds=durations[filepath],
             status="pending",
         )
-        db.session.add(video)
-        added += 1
-
+        for filepath in new_paths
+    ])
     db.session.commit()
+    added = len(new_paths)
 
     if added:
         flash(f"Added {added} video(s) for processing.", "success")
@@ -100,6 +212,61 @@ def scan():
     return redirect(url_for("index"))
 
 
+# Spool files are created 0600; linked uploads get the mode a plain open()
+# would have given them. Read once at import, as os.umask() can only be
+# queried by setting it, which isn't safe once request threads are running.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# os.link() failures that mean "can't hard-link here", not "can't write here"
+_NO_LINK_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EACCES, errno.EMLINK, errno.ENOTSUP}
+
+
+def _upload_names(safe_name):
+    """Yield *safe_name*, then name_1.ext, name_2.ext, ... as fallbacks."""
+    yield safe_name
+    base, ext = os.path.splitext(safe_name)
+    counter = 1
+    while True:
+        yield f"{base}_{counter}{ext}"
+        counter += 1
+
+
+def _save_upload(f, upload_dir, safe_name):
+    """Write uploaded file *f* into *upload_dir* without overwriting; return its path.
+
+    The spooled temp file is hard-linked into place when possible, otherwise
+    copied. Both create the destination exclusively, so a name taken by a
+    concurrent upload just moves on to the next counter suffix.
+    """
+    spooled = getattr(f.stream, "name", None)
+    can_link = isinstance(spooled, str)
+    if can_link:
+        f.stream.flush()
+    for name in _upload_names(safe_name):
+        dest = os.path.join(upload_dir, name)
+        if can_link:
+            try:
+                os.link(spooled, dest)
+            except FileExistsError:
+                continue
+            except OSError as exc:
+                if exc.errno not in _NO_LINK_ERRNOS:
+                    raise
+                can_link = False  # e.g. filesystem without hard links; copy instead
+            else:
+                os.chmod(dest, 0o666 & ~_UMASK)
+                return dest
+        try:
+            out = open(dest, "xb")
+        except FileExistsError:
+            continue
+        with out:
+            f.stream.seek(0)
+            shutil.copyfileobj(f.stream, out, length=app.config["UPLOAD_BUFFER_SIZE"])
+        return dest
+
+
 @app.route("/upload", methods=["POST"])
 def upload():
     files = request.files.getlist("files")
@@ -110,42 +277,38 @@ def upload():
     upload_dir = os.path.join(app.root_path, "uploads")
     os.makedirs(upload_dir, exist_ok=True)
 
-    added = 0
-    for f in files:
-        if not f.filename:
-            continue
-        ext = os.path.splitext(f.filename)[1].lower()
-        if ext not in VIDEO_EXTENSIONS:
-            continue
-
-        safe_name = secure_filename(f.filename)
-        dest = os.path.join(upload_dir, safe_name)
-
-        # Avoid overwriting — append counter if file exists
-        if os.path.exists(dest):
-            base, ext_ = os.path.splitext(safe_name)
-            counter = 1
-            while os.path.exists(dest):
-                dest = os.path.join(upload_dir, f"{base}_{counter}{ext_}")
-                counter += 1
+    # Saving must happen on the request thread (the upload streams belong to
+    # it), but each file's ffprobe can run while the next file is written.
+    saved = []
+    with ThreadPoolExecutor(max_workers=min(8, len(files))) as pool:
+        probes = {}
+        for f in files:
+            if not f.filename:
+                continue
+            ext = os.path.splitext(f.filename)[1].lower()
+            if ext not in VIDEO_EXTENSIONS:
+                continue
 
-        f.save(dest)
+            dest = _save_upload(f, upload_dir, secure_filename(f.filename))
+            saved.append(dest)
+            probes[pool.submit(get_video_duration, dest)] = dest
 
-        existing = Video.query.filter_by(filepath=dest).first()
-        if existing:
-            continue
+        durations = {probes[fut]: fut.result() for fut in as_completed(probes)}
 
-        video = Video(
+    existing = _existing_filepaths(saved)
+    new_paths = [p for p in saved if p not in existing]
+    db.session.add_all([
+        Video(
             filename=os.path.basename(dest),
             filepath=dest,
             folder="uploads",
-            duration_seconds=get_video_duration(dest),
+            duration_seconds=durations[dest],
             status="pending",
         )
-        db.session.add(video)
-        added += 1
-
+        for dest in new_paths
+    ])
     db.session.commit()
+    added = len(new_paths)
 
     if added:
         flash(f"Uploaded {added} video(s) for processing.", "success")
@@ -158,20 +321,21 @@ def upload():
 
 @app.route("/video/<int:video_id>")
 def detail(video_id):
-    video = db.get_or_404(Video, video_id)
+    video = db.get_or_404(Video, video_id, options=[db.undefer_group("transcript")])
     segments = []
-    if video.segments_json:
-        raw = json.loads(video.segments_json)
+    if video.segments_blob:
+        raw = msgpack.unpackb(video.segments_blob)
         for idx, seg in enumerate(raw):
             segments.append({
                 "index": idx,
-                "timestamp": _format_timestamp(seg["start"]),
+                # "ts" is precomputed by the worker; older rows lack it
+                "timestamp": seg.get("ts") or format_timestamp(seg["start"]),
                 "text": seg["text"],
             })
     # Gather screenshots
     screenshots = []
     if video.screenshots_json:
-        screenshots = json.loads(video.screenshots_json)
+        screenshots = orjson.loads(video.screenshots_json)
         for shot in screenshots:
             if shot.get("filename"):
                 shot["url"] = url_for(
@@ -183,24 +347,23 @@ def detail(video_id):
     )
 
 
-def _format_timestamp(seconds):
-    """Convert float seconds to HH:MM:SS string."""
-    s = int(seconds)
-    h, s = divmod(s, 3600)
-    m, s = divmod(s, 60)
-    return f"{h:02d}:{m:02d}:{s:02d}"
+# Control characters can't occur in transcript text, so they are safe markers
+# for snippet() to wrap matches in before the text is HTML-escaped.
+_HL_OPEN = "\x02"
+_HL_CLOSE = "\x03"
 
 
-def _highlight(text, query):
-    """Return Markup with search term wrapped in highlight span."""
-    from markupsafe import escape
-    safe_text = str(escape(text))
-    safe_query = str(escape(query))
-    pattern = re.compile(re.escape(safe_query), re.IGNORECASE)
-    result = pattern.sub(
-        lambda m: f'<span class="search-highlight">{m.group()}</span>', safe_text
-    )
-    return Markup(result)
+def _fts_query(query):
+    """Quote *query* as an FTS5 prefix phrase so user input can't break MATCH syntax."""
+    return '"' + query.replace('"', '""') + '"*'
+
+
+def _highlight_snippet(snippet):
+    """Escape an FTS snippet and turn its match markers into highlight spans."""
+    safe = str(escape(snippet))
+    safe = safe.replace(_HL_OPEN, '<span class="search-highlight">')
+    safe = safe.replace(_HL_CLOSE, "</span>")
+    return Markup(safe)
 
 
 @app.route("/search")
@@ -210,40 +373,93 @@ def search():
     total_matches = 0
 
     if query:
-        videos = Video.query.filter_by(status="done").all()
-        for video in videos:
-            if not video.segments_json:
-                continue
-            segments = json.loads(video.segments_json)
-            matches = []
-            for idx, seg in enumerate(segments):
-                if query.lower() in seg["text"].lower():
-                    matches.append({
-                        "index": idx,
-                        "timestamp": _format_timestamp(seg["start"]),
-                        "text": _highlight(seg["text"], query),
-                    })
-            if matches:
-                results.append({"video": video, "matches": matches})
-                total_matches += len(matches)
+        rows = db.session.execute(
+            db.text(
+                "SELECT v.id, v.filename, s.seg_index, s.start, "
+                "snippet(segment_fts, 3, :hl_open, :hl_close, '…', 32) "
+                "FROM segment_fts s JOIN video v ON v.id = s.video_id "
+                "WHERE segment_fts MATCH :q "
+                "ORDER BY v.id, s.seg_index"
+            ),
+            {"q": _fts_query(query), "hl_open": _HL_OPEN, "hl_close": _HL_CLOSE},
+        )
+        for (video_id, filename), group in groupby(rows, key=lambda r: (r[0], r[1])):
+            matches = [
+                {
+                    "index": seg_index,
+                    "timestamp": format_timestamp(start),
+                    "text": _highlight_snippet(snippet),
+                }
+                for _, _, seg_index, start, snippet in group
+            ]
+            results.append({"video": {"id": video_id, "filename": filename}, "matches": matches})
+            total_matches += len(matches)
 
     return render_template(
         "search.html", query=query, results=results, total_matches=total_matches
     )
 
 
-@app.route("/api/status")
-def api_status():
-    videos = Video.query.order_by(Video.created_at.desc()).all()
-    counts = {
-        "done": Video.query.filter_by(status="done").count(),
-        "processing": Video.query.filter_by(status="processing").count(),
-        "pending": Video.query.filter_by(status="pending").count(),
-        "failed": Video.query.filter_by(status="failed").count(),
-    }
-    return jsonify(
-        counts=counts,
-        videos=[
+def _parse_timestamp(value):
+    """Parse an ISO timestamp into the naive UTC form updated_at is stored in."""
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+# How far behind the updated_after cursor the change feed looks. Covers the
+# gap between a row's updated_at being stamped and its transaction committing
+# (SQLite's busy timeout alone can stall a commit for 5 s).
+_FEED_OVERLAP = timedelta(seconds=30)
+
+
+def _status_payload(since_id=None, updated_after=None):
+    """Build the counts + video list snapshot served by /api/status and /events.
+
+    With *since_id* and/or *updated_after*, only videos added or changed after
+    that cursor are listed. The returned "cursor" is what to pass next time.
+
+    updated_at is stamped in Python before the flush, not at commit, so a
+    worker thread can commit a timestamp older than one another thread has
+    already committed and the cursor has moved past. Updates are therefore
+    matched from _FEED_OVERLAP before the cursor; rows seen again are simply
+    upserted by id on the client.
+    """
+    # Counts first: a commit landing between the two queries then shows up
+    # in the list but not yet in the counts, so the client keeps listening
+    # rather than stopping on counts that are newer than the rows it got.
+    counts = _status_counts()
+    query = Video.query.with_entities(
+        Video.id,
+        Video.filename,
+        Video.folder,
+        Video.duration_seconds,
+        Video.status,
+        Video.report_path,
+        Video.transcript_preview,
+        Video.updated_at,
+    )
+    changed = []
+    if since_id is not None:
+        changed.append(Video.id > since_id)
+    if updated_after is not None:
+        changed.append(Video.updated_at > updated_after - _FEED_OVERLAP)
+    if changed:
+        query = query.filter(db.or_(*changed))
+    videos = query.order_by(Video.created_at.desc()).all()
+
+    # A cursor never moves backwards: rows returned only because they were
+    # updated can have lower ids / older timestamps than the incoming cursor.
+    max_id = max([since_id or 0, *(v.id for v in videos)])
+    last_update = max(
+        [t for t in (updated_after, *(v.updated_at for v in videos)) if t], default=None
+    )
+    return {
+        "counts": counts,
+        "videos": [
             {
                 "id": v.id,
                 "filename": v.filename,
@@ -255,6 +471,99 @@ def api_status():
             }
             for v in videos
         ],
+        "cursor": {
+            "since": max_id,
+            "updated_after": last_update.isoformat() if last_update else None,
+        },
+    }
+
+
+@app.route("/api/status")
+def api_status():
+    """Video status list; ``?since=<id>&updated_after=<iso ts>`` returns only changes."""
+    return jsonify(_status_payload(
+        since_id=request.args.get("since", type=int),
+        updated_after=request.args.get("updated_after", type=_parse_timestamp),
+    ))
+
+
+# An open /events stream holds its worker thread until it ends, and each tab
+# reconnects right away, so a tab effectively occupies one thread for as long
+# as it is open. Streams are capped so a dead client is noticed eventually;
+# the cap does not free the thread. Serve the app with a threaded worker class
+# (e.g. ``gunicorn -k gthread --threads 16 app:app``) so tabs can't starve
+# other requests. Under a non-threaded server each /events request sends one
+# snapshot and ends, and the browser polls every _SSE_POLL_RETRY_MS instead.
+_SSE_STREAM_SECONDS = 25
+_SSE_RETRY_MS = 1000
+_SSE_POLL_RETRY_MS = 3000
+
+
+def _parse_event_id(event_id):
+    """Turn an SSE ``Last-Event-ID`` ("<since>|<updated_after>") back into a cursor."""
+    try:
+        since, updated_after = event_id.split("|", 1)
+        return int(since), _parse_timestamp(updated_after) if updated_after else None
+    except (AttributeError, ValueError):
+        return None, None  # no or malformed id: start with a full snapshot
+
+
+@app.route("/events")
+def events():
+    """Push a status snapshot as a Server-Sent Event whenever the database changes.
+
+    The worker runs in a separate consumer process, so changes are detected
+    with SQLite's ``PRAGMA data_version``, which a connection sees bump
+    whenever *another* connection commits. Checking it touches no tables, so
+    the snapshot query only runs when something actually changed.
+
+    The stream closes after _SSE_STREAM_SECONDS; EventSource reconnects and
+    sends the last event id, so the next stream resumes from the same cursor.
+    A streaming response needs a threaded server; on one that isn't (e.g. a
+    gunicorn sync worker) this sends a single event and returns, which the
+    browser's reconnects turn into plain polling.
+    """
+    db_path = os.path.join(app.instance_path, "videos.db")
+    since_id, updated_after = _parse_event_id(request.headers.get("Last-Event-ID"))
+    if request.environ.get("wsgi.multithread"):
+        stream_seconds, retry_ms = _SSE_STREAM_SECONDS, _SSE_RETRY_MS
+    else:
+        stream_seconds, retry_ms = 0, _SSE_POLL_RETRY_MS
+
+    def stream(since_id, updated_after):
+        watcher = sqlite3.connect(db_path)
+        try:
+            yield f"retry: {retry_ms}\n\n"
+            version = None
+            idle = 0
+            deadline = time.monotonic() + stream_seconds
+            while True:
+                new_version = watcher.execute("PRAGMA data_version").fetchone()[0]
+                if new_version != version:
+                    version = new_version
+                    idle = 0
+                    with app.app_context():
+                        payload = _status_payload(since_id, updated_after)
+                    since_id = payload["cursor"]["since"]
+                    updated_after = payload["cursor"]["updated_after"]
+                    event_id = f"{since_id}|{updated_after or ''}"
+                    if updated_after:
+                        updated_after = _parse_timestamp(updated_after)
+                    yield f"id: {event_id}\ndata: {orjson.dumps(payload).decode()}\n\n"
+                elif idle >= 15:
+                    idle = 0
+                    yield ": keepalive\n\n"
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(1)
+                idle += 1
+        finally:
+            watcher.close()
+
+    return Response(
+        stream(since_id, updated_after),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -303,7 +612,7 @@ def retry(video_id):
 @app.route("/stop-processing", methods=["POST"])
 def stop_processing_route():
     stop_processing(app)
-    flash("Processing stopped. Remaining videos returned to pending.", "warning")
+    flash("Queued videos cancelled. Videos already processing will finish.", "warning")
     return redirect(url_for("index"))
 
 
@@ -335,6 +644,7 @@ def delete_selected():
         db.session.delete(video)
         deleted += 1
 
+    clear_segments(video_ids)
     db.session.commit()
     flash(f"Deleted {deleted} video(s).", "success")
     return redirect(url_for("index"))
@@ -355,6 +665,7 @@ def delete_all():
 
     # Delete all rows from the Video table
     Video.query.delete()
+    clear_segments()
     db.session.commit()
 
     flash("All data deleted successfully.", "success")
@@ -9,6 +9,14 @@ db = SQLAlchemy()
 
 class Video(db.Model):
     __tablename__ = "video"
+    __table_args__ = (
+        # Worker poll: WHERE status = 'pending' ORDER BY created_at
+        db.Index("ix_video_status_created", "status", "created_at"),
+        # Dashboard and status API: ORDER BY created_at DESC
+        db.Index("ix_video_created", "created_at"),
+        # Status API change feed: WHERE updated_at > :ts
+        db.Index("ix_video_updated", "updated_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     filename = db.Column(db.Text, nullable=False)
@@ -17,9 +25,14 @@ class Video(db.Model):
     duration_seconds = db.Column(db.Float, nullable=True)
     status = db.Column(db.Text, nullable=False, default="pending")
     error_message = db.Column(db.Text, nullable=True)
-    transcript_text = db.Column(db.Text, nullable=True)
+    # Large payload columns are deferred so list views don't load them;
+    # touching any one of them loads the whole "transcript" group.
+    transcript_text = db.deferred(db.Column(db.Text, nullable=True), group="transcript")
     transcript_preview = db.Column(db.Text, nullable=True)
-    segments_json = db.Column(db.Text, nullable=True)
+    # msgpack-encoded segment list
+    segments_blob = db.deferred(db.Column(db.LargeBinary, nullable=True), group="transcript")
+    # Legacy JSON segments; moved to segments_blob on startup
+    segments_json = db.deferred(db.Column(db.Text, nullable=True), group="transcript")
     txt_path = db.Column(db.Text, nullable=True)
     srt_path = db.Column(db.Text, nullable=True)
     report_path = db.Column(db.Text, nullable=True)
@@ -27,3 +40,40 @@ class Video(db.Model):
     output_dir = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     processed_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(
+        db.DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+
+def index_segments(video_id, segments):
+    """Replace the full-text search rows for *video_id* with *segments*."""
+    db.session.execute(
+        db.text("DELETE FROM segment_fts WHERE video_id = :video_id"),
+        {"video_id": video_id},
+    )
+    rows = [
+        {"video_id": video_id, "seg_index": idx, "start": seg["start"], "text": seg["text"]}
+        for idx, seg in enumerate(segments)
+    ]
+    if rows:
+        db.session.execute(
+            db.text(
+                "INSERT INTO segment_fts (video_id, seg_index, start, text) "
+                "VALUES (:video_id, :seg_index, :start, :text)"
+            ),
+            rows,
+        )
+
+
+def clear_segments(video_ids=None):
+    """Drop search rows for *video_ids*, or for every video when None."""
+    if video_ids is None:
+        db.session.execute(db.text("DELETE FROM segment_fts"))
+        return
+    for video_id in video_ids:
+        db.session.execute(
+            db.text("DELETE FROM segment_fts WHERE video_id = :video_id"),
+            {"video_id": video_id},
+        )
@@ -54,29 +54,27 @@ def transcribe_audio(audio_path: str):
 
 def format_srt_time(seconds: float) -> str:
     """Convert seconds to SRT timestamp format (HH:MM:SS,mmm)."""
-    hrs = int(seconds // 3600)
-    mins = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    millis = int(round((seconds - int(seconds)) * 1000))
+    secs, millis = divmod(int(round(seconds * 1000)), 1000)
+    mins, secs = divmod(secs, 60)
+    hrs, mins = divmod(mins, 60)
     return f"{hrs:02d}:{mins:02d}:{secs:02d},{millis:03d}"
 
 
 def write_txt(segments, output_path: str) -> None:
     """Write plain-text transcript."""
     with open(output_path, "w", encoding="utf-8") as f:
-        for seg in segments:
-            f.write(seg["text"].strip() + "\n")
+        f.write("".join(seg["text"].strip() + "\n" for seg in segments))
     print(f"Transcript saved to {output_path}")
 
 
 def write_srt(segments, output_path: str) -> None:
     """Write SRT subtitle file."""
     with open(output_path, "w", encoding="utf-8") as f:
-        for i, seg in enumerate(segments, start=1):
-            start = format_srt_time(seg["start"])
-            end = format_srt_time(seg["end"])
-            text = seg["text"].strip()
-            f.write(f"{i}\n{start} --> {end}\n{text}\n\n")
+        f.write("".join(
+            f"{i}\n{format_srt_time(seg['start'])} --> {format_srt_time(seg['end'])}\n"
+            f"{seg['text'].strip()}\n\n"
+            for i, seg in enumerate(segments, start=1)
+        ))
     print(f"Subtitles saved to {output_path}")
 
 
@@ -5,17 +5,18 @@ and avoids print() side-effects so callers control output.
 """
 
 import glob
-import json
 import os
 import shutil
 import subprocess
-import tempfile
 
+import orjson
 from openai import OpenAI
 
 VIDEO_EXTENSIONS = {
     ".mp4", ".avi", ".mkv", ".mov", ".webm", ".flv", ".wmv", ".m4v", ".mpg", ".mpeg",
 }
+# str.endswith() takes a tuple, letting scan_folder test every extension in one call
+_EXT_TUPLE = tuple(VIDEO_EXTENSIONS)
 
 # WinGet installs ffmpeg here; shutil.which() misses it when the shell hasn't reloaded PATH.
 _WINGET_FFMPEG_GLOB = os.path.join(
@@ -24,16 +25,26 @@ _WINGET_FFMPEG_GLOB = os.path.join(
 )
 
 
+# Resolved tool paths. Misses aren't stored, so installing ffmpeg while the app
+# is running takes effect without a restart.
+_tool_paths: dict[str, str] = {}
+
+
 def _find_tool(name: str) -> str:
     """Return the path to *name* (e.g. 'ffmpeg'), searching PATH then WinGet."""
+    if name in _tool_paths:
+        return _tool_paths[name]
     found = shutil.which(name)
-    if found:
-        return found
-    for bin_dir in glob.glob(_WINGET_FFMPEG_GLOB):
-        candidate = os.path.join(bin_dir, f"{name}.exe")
-        if os.path.isfile(candidate):
-            return candidate
-    return name  # fall back to bare name — will raise FileNotFoundError if missing
+    if not found:
+        for bin_dir in glob.glob(_WINGET_FFMPEG_GLOB):
+            candidate = os.path.join(bin_dir, f"{name}.exe")
+            if os.path.isfile(candidate):
+                found = candidate
+                break
+    if not found:
+        return name  # fall back to bare name — will raise FileNotFoundError if missing
+    _tool_paths[name] = found
+    return found
 
 
 def scan_folder(path: str) -> list[str]:
@@ -42,7 +53,7 @@ def scan_folder(path: str) -> list[str]:
         raise ValueError(f"Not a valid directory: {path}")
     results = []
     for entry in os.scandir(path):
-        if entry.is_file() and os.path.splitext(entry.name)[1].lower() in VIDEO_EXTENSIONS:
+        if entry.name.lower().endswith(_EXT_TUPLE) and entry.is_file():
             results.append(entry.path)
     results.sort()
     return results
@@ -67,53 +78,50 @@ def get_video_duration(path: str) -> float | None:
         return None
 
 
-def extract_audio(video_path: str) -> str:
-    """Extract audio from video file as a temporary mp3.
+def extract_audio(video_path: str) -> bytes:
+    """Extract audio from video file as in-memory mono 16 kHz Opus (Ogg) bytes.
 
     Raises RuntimeError on failure (instead of sys.exit).
     """
-    fd, audio_path = tempfile.mkstemp(suffix=".mp3")
-    os.close(fd)
     try:
-        subprocess.run(
+        result = subprocess.run(
             [
-                _find_tool("ffmpeg"), "-y",
+                _find_tool("ffmpeg"),
                 "-i", video_path,
                 "-vn",
-                "-acodec", "libmp3lame",
-                "-q:a", "4",
-                audio_path,
+                "-ac", "1",
+                "-ar", "16000",
+                "-c:a", "libopus",
+                "-b:a", "24k",
+                "-f", "ogg",
+                "pipe:1",
             ],
             check=True,
             capture_output=True,
         )
     except FileNotFoundError:
-        os.unlink(audio_path)
         raise RuntimeError("FFmpeg not found. Install it and ensure it is on your PATH.")
     except subprocess.CalledProcessError as exc:
-        os.unlink(audio_path)
         raise RuntimeError(f"Error extracting audio: {exc.stderr.decode()}")
-    return audio_path
+    return result.stdout
 
 
-def transcribe_audio(audio_path: str):
-    """Send audio to OpenAI Whisper API and return segments."""
+def transcribe_audio(audio: bytes):
+    """Send Ogg/Opus audio to OpenAI Whisper API and return segments."""
     client = OpenAI()
-    with open(audio_path, "rb") as f:
-        response = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=f,
-            response_format="verbose_json",
-        )
+    response = client.audio.transcriptions.create(
+        model="whisper-1",
+        file=("audio.ogg", audio, "audio/ogg"),
+        response_format="verbose_json",
+    )
     return response.segments
 
 
 def format_srt_time(seconds: float) -> str:
     """Convert seconds to SRT timestamp format (HH:MM:SS,mmm)."""
-    hrs = int(seconds // 3600)
-    mins = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    millis = int(round((seconds - int(seconds)) * 1000))
+    secs, millis = divmod(int(round(seconds * 1000)), 1000)
+    mins, secs = divmod(secs, 60)
+    hrs, mins = divmod(mins, 60)
     return f"{hrs:02d}:{mins:02d}:{secs:02d},{millis:03d}"
 
 
@@ -125,21 +133,20 @@ def segments_to_text(segments) -> str:
 def write_txt(segments, output_path: str) -> None:
     """Write plain-text transcript (no print side-effects)."""
     with open(output_path, "w", encoding="utf-8") as f:
-        for seg in segments:
-            f.write(seg["text"].strip() + "\n")
+        f.write("".join(seg["text"].strip() + "\n" for seg in segments))
 
 
 def write_srt(segments, output_path: str) -> None:
     """Write SRT subtitle file (no print side-effects)."""
     with open(output_path, "w", encoding="utf-8") as f:
-        for i, seg in enumerate(segments, start=1):
-            start = format_srt_time(seg["start"])
-            end = format_srt_time(seg["end"])
-            text = seg["text"].strip()
-            f.write(f"{i}\n{start} --> {end}\n{text}\n\n")
+        f.write("".join(
+            f"{i}\n{format_srt_time(seg['start'])} --> {format_srt_time(seg['end'])}\n"
+            f"{seg['text'].strip()}\n\n"
+            for i, seg in enumerate(segments, start=1)
+        ))
 
 
-def _format_seconds(seconds: float) -> str:
+def format_timestamp(seconds: float) -> str:
     """Convert seconds to HH:MM:SS."""
     s = int(seconds)
     h, s = divmod(s, 3600)
@@ -317,7 +324,7 @@ def analyze_screenshots(
         # Handle potential markdown fences
         if raw.startswith("```"):
             raw = raw.split("\n", 1)[1].rsplit("```", 1)[0].strip()
-        all_moments.extend(json.loads(raw))
+        all_moments.extend(orjson.loads(raw))
 
     # Sort by timestamp and enforce minimum gap between screenshots
     all_moments.sort(key=lambda m: m["timestamp"])
@@ -355,8 +362,8 @@ def generate_report(
         seg_end = seg["end"]
 
         # Write the segment text with timestamp
-        start_str = _format_seconds(seg_start)
-        end_str = _format_seconds(seg_end)
+        start_str = format_timestamp(seg_start)
+        end_str = format_timestamp(seg_end)
         p = doc.add_paragraph()
         run = p.add_run(f"[{start_str} - {end_str}]  ")
         run.bold = True
@@ -1,28 +1,57 @@
-"""Background worker thread for batch video transcription."""
+"""Durable job queue for batch video transcription.
+
+Each pending video is a huey task stored in a SQLite-backed queue, so queued
+work survives restarts and runs outside the web process. Start a consumer
+next to the Flask app (``-w`` sets how many videos are processed at once):
+
+    huey_consumer worker.huey -w 4 -k thread
+
+Serve the app itself with a threaded worker class, e.g.
+``gunicorn -k gthread --threads 16 app:app``, so dashboard /events streams
+don't tie up the workers other requests need.
+
+Transient OpenAI errors are retried by huey. If a consumer dies mid-video,
+the row stays "processing"; a periodic task re-queues rows that have been
+processing for longer than STALE_PROCESSING_MINUTES, so set that comfortably
+above the time your longest video takes.
+"""
 
-import json
 import os
 import re
-import threading
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
-from models import Video, db
+import msgpack
+import openai
+import orjson
+from huey import SqliteHuey, crontab
+
+from models import Video, db, index_segments
 from transcription import (
     analyze_screenshots,
     extract_audio,
     extract_frame,
+    format_timestamp,
     generate_report,
     generate_summary,
-    get_video_duration,
     segments_to_text,
     transcribe_audio,
     write_srt,
     write_txt,
 )
 
-_lock = threading.Lock()
-_running = False
-_cancel_event = threading.Event()
+# Kept out of videos.db so queue writes don't contend with the app's tables.
+_QUEUE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance")
+os.makedirs(_QUEUE_DIR, exist_ok=True)
+huey = SqliteHuey("video-transcriber", filename=os.path.join(_QUEUE_DIR, "huey.db"))
+
+STALE_PROCESSING_MINUTES = int(os.environ.get("STALE_PROCESSING_MINUTES", "120"))
+
+# Worth retrying: the request never completed or the service asked us to back off.
+_TRANSIENT_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
 
 
 def _sanitize_folder_name(name: str) -> str:
@@ -31,165 +60,211 @@ def _sanitize_folder_name(name: str) -> str:
     return re.sub(r'[<>:"/\\|?*]', '_', base).strip('. ')
 
 
-def _process_videos(app):
-    """Worker loop: process pending videos one at a time."""
-    global _running
+def _stale_cutoff():
+    """Rows processing since before this are assumed to have lost their consumer."""
+    return datetime.now(timezone.utc) - timedelta(minutes=STALE_PROCESSING_MINUTES)
+
+
+def _claim(video_id):
+    """Atomically move *video_id* to processing; False if another task owns it.
+
+    Pending videos can be claimed, and so can videos stuck in processing past
+    the stale cutoff (their consumer crashed).
+    """
+    claimed = db.session.execute(
+        db.update(Video)
+        .where(
+            Video.id == video_id,
+            db.or_(
+                Video.status == "pending",
+                db.and_(Video.status == "processing", Video.updated_at < _stale_cutoff()),
+            ),
+        )
+        .values(status="processing")
+    ).rowcount
+    db.session.commit()
+    return claimed == 1
+
+
+def _process_one(app, video_id, retry_transient=False):
+    """Transcribe a single claimed video in its own app context (and session).
+
+    With *retry_transient*, a transient OpenAI error hands the video back to
+    pending and re-raises so huey retries it, instead of marking it failed.
+    """
     with app.app_context():
-        while True:
-            if _cancel_event.is_set():
-                break
-
-            video = (
-                Video.query
-                .filter_by(status="pending")
-                .order_by(Video.created_at.asc())
-                .first()
-            )
-            if video is None:
-                break
+        video = db.session.get(Video, video_id)
+        if video is None:
+            return
 
-            video.status = "processing"
-            db.session.commit()
+        try:
+            # Extract audio
+            audio = extract_audio(video.filepath)
 
-            audio_path = None
-            try:
-                # Get duration if missing
-                if video.duration_seconds is None:
-                    video.duration_seconds = get_video_duration(video.filepath)
-                    db.session.commit()
-
-                # Extract audio
-                audio_path = extract_audio(video.filepath)
-
-                # Transcribe
-                segments = transcribe_audio(audio_path)
-
-                # Convert segments to serialisable dicts
-                seg_dicts = [dict(s) for s in segments]
-
-                # Build per-video output folder
-                output_base = os.path.join(app.root_path, "output")
-                safe_name = _sanitize_folder_name(video.filename)
-                video_output_dir = os.path.join(output_base, safe_name)
-
-                # Handle duplicate folder names by appending video id
-                if os.path.exists(video_output_dir):
-                    marker_path = os.path.join(video_output_dir, ".video_id")
-                    if os.path.isfile(marker_path):
-                        with open(marker_path) as mf:
-                            if mf.read().strip() != str(video.id):
-                                video_output_dir = os.path.join(
-                                    output_base, f"{safe_name}_{video.id}"
-                                )
-                    else:
-                        video_output_dir = os.path.join(
-                            output_base, f"{safe_name}_{video.id}"
-                        )
-
-                os.makedirs(video_output_dir, exist_ok=True)
-
-                # Write marker file for re-processing detection
-                with open(os.path.join(video_output_dir, ".video_id"), "w") as mf:
-                    mf.write(str(video.id))
-
-                screenshots_dir = os.path.join(video_output_dir, "screenshots")
-                os.makedirs(screenshots_dir, exist_ok=True)
-
-                # Write transcript files into the per-video folder
-                txt_path = os.path.join(video_output_dir, "transcript.txt")
-                srt_path = os.path.join(video_output_dir, "transcript.srt")
-                write_txt(seg_dicts, txt_path)
-                write_srt(seg_dicts, srt_path)
-
-                # Screenshot analysis: scene detection + GPT-4o
-                try:
-                    screenshot_moments = analyze_screenshots(
-                        seg_dicts, video_path=video.filepath
-                    )
-                except Exception:
-                    screenshot_moments = []
-
-                # Frame extraction
-                for i, moment in enumerate(screenshot_moments):
-                    if _cancel_event.is_set():
-                        break
-                    ts = moment["timestamp"]
-                    desc_slug = re.sub(r'[^a-zA-Z0-9]+', '_', moment.get("description", ""))[:40]
-                    img_filename = f"{i + 1:03d}_{ts:.0f}s_{desc_slug}.png"
-                    img_path = os.path.join(screenshots_dir, img_filename)
-                    try:
-                        extract_frame(video.filepath, ts, img_path)
-                        moment["image_path"] = img_path
-                        moment["image_filename"] = img_filename
-                    except Exception:
-                        moment["image_path"] = None
-                        moment["image_filename"] = None
-
-                # Generate Word report
-                try:
-                    report_path = generate_report(
-                        video.filename, seg_dicts, screenshot_moments, video_output_dir
+            # Transcribe
+            segments = transcribe_audio(audio)
+
+            # Convert segments to serialisable dicts, with display timestamps
+            seg_dicts = [dict(s) for s in segments]
+            for seg in seg_dicts:
+                seg["ts"] = format_timestamp(seg["start"])
+
+            # Build per-video output folder
+            output_base = os.path.join(app.root_path, "output")
+            safe_name = _sanitize_folder_name(video.filename)
+            video_output_dir = os.path.join(output_base, safe_name)
+
+            # Handle duplicate folder names by appending video id
+            if os.path.exists(video_output_dir):
+                marker_path = os.path.join(video_output_dir, ".video_id")
+                if os.path.isfile(marker_path):
+                    with open(marker_path) as mf:
+                        if mf.read().strip() != str(video.id):
+                            video_output_dir = os.path.join(
+                                output_base, f"{safe_name}_{video.id}"
+                            )
+                else:
+                    video_output_dir = os.path.join(
+                        output_base, f"{safe_name}_{video.id}"
                     )
-                except Exception:
-                    report_path = None
 
-                # Update record
-                full_text = segments_to_text(seg_dicts)
-                video.transcript_text = full_text
+            os.makedirs(video_output_dir, exist_ok=True)
+
+            # Write marker file for re-processing detection
+            with open(os.path.join(video_output_dir, ".video_id"), "w") as mf:
+                mf.write(str(video.id))
+
+            screenshots_dir = os.path.join(video_output_dir, "screenshots")
+            os.makedirs(screenshots_dir, exist_ok=True)
+
+            # Write transcript files into the per-video folder
+            txt_path = os.path.join(video_output_dir, "transcript.txt")
+            srt_path = os.path.join(video_output_dir, "transcript.srt")
+            write_txt(seg_dicts, txt_path)
+            write_srt(seg_dicts, srt_path)
+
+            # Screenshot analysis: scene detection + GPT-4o
+            try:
+                screenshot_moments = analyze_screenshots(
+                    seg_dicts, video_path=video.filepath
+                )
+            except Exception:
+                screenshot_moments = []
+
+            # Frame extraction
+            for i, moment in enumerate(screenshot_moments):
+                ts = moment["timestamp"]
+                desc_slug = re.sub(r'[^a-zA-Z0-9]+', '_', moment.get("description", ""))[:40]
+                img_filename = f"{i + 1:03d}_{ts:.0f}s_{desc_slug}.png"
+                img_path = os.path.join(screenshots_dir, img_filename)
                 try:
-                    video.transcript_preview = generate_summary(full_text)
+                    extract_frame(video.filepath, ts, img_path)
+                    moment["image_path"] = img_path
+                    moment["image_filename"] = img_filename
                 except Exception:
-                    video.transcript_preview = full_text[:200]
-                video.segments_json = json.dumps(seg_dicts)
-                video.txt_path = txt_path
-                video.srt_path = srt_path
-                video.report_path = report_path
-                video.screenshots_json = json.dumps([
-                    {
-                        "timestamp": m["timestamp"],
-                        "description": m["description"],
-                        "filename": m.get("image_filename"),
-                    }
-                    for m in screenshot_moments
-                    if m.get("image_path")
-                ])
-                video.output_dir = video_output_dir
-                video.status = "done"
-                video.processed_at = datetime.now(timezone.utc)
-                db.session.commit()
+                    moment["image_path"] = None
+                    moment["image_filename"] = None
 
-            except Exception as exc:
-                video.status = "failed"
-                video.error_message = str(exc)
-                video.processed_at = datetime.now(timezone.utc)
+            # Generate Word report
+            try:
+                report_path = generate_report(
+                    video.filename, seg_dicts, screenshot_moments, video_output_dir
+                )
+            except Exception:
+                report_path = None
+
+            # Update record
+            full_text = segments_to_text(seg_dicts)
+            video.transcript_text = full_text
+            try:
+                video.transcript_preview = generate_summary(full_text)
+            except Exception:
+                video.transcript_preview = full_text[:200]
+            video.segments_blob = msgpack.packb(seg_dicts)
+            index_segments(video.id, seg_dicts)
+            video.txt_path = txt_path
+            video.srt_path = srt_path
+            video.report_path = report_path
+            video.screenshots_json = orjson.dumps([
+                {
+                    "timestamp": m["timestamp"],
+                    "description": m["description"],
+                    "filename": m.get("image_filename"),
+                }
+                for m in screenshot_moments
+                if m.get("image_path")
+            ]).decode()
+            video.output_dir = video_output_dir
+            video.status = "done"
+            video.processed_at = datetime.now(timezone.utc)
+            db.session.commit()
+
+        except Exception as exc:
+            # Discard any half-applied results and just record the outcome
+            db.session.rollback()
+            if retry_transient and isinstance(exc, _TRANSIENT_ERRORS):
+                db.session.execute(
+                    db.update(Video).where(Video.id == video_id).values(status="pending")
+                )
                 db.session.commit()
+                raise
+            db.session.execute(
+                db.update(Video)
+                .where(Video.id == video_id)
+                .values(
+                    status="failed",
+                    error_message=str(exc),
+                    processed_at=datetime.now(timezone.utc),
+                )
+            )
+            db.session.commit()
 
-            finally:
-                if audio_path and os.path.exists(audio_path):
-                    os.unlink(audio_path)
 
-    with _lock:
-        _running = False
+@huey.task(retries=3, retry_delay=60, context=True)
+def transcribe_one(video_id, task=None):
+    """Claim and transcribe one video; a no-op if another task owns it.
 
+    Duplicate enqueues are harmless because only one task can win the claim.
+    """
+    from app import app  # deferred: app.py imports this module
 
-def start_processing(app):
-    """Spawn the worker thread if it isn't already running."""
-    global _running
-    with _lock:
-        if _running:
+    with app.app_context():
+        if not _claim(video_id):
             return
-        _running = True
-    _cancel_event.clear()
-    t = threading.Thread(target=_process_videos, args=(app,), daemon=True)
-    t.start()
+    _process_one(app, video_id, retry_transient=task.retries > 0)
 
 
-def stop_processing(app):
-    """Signal the worker to stop after the current video finishes."""
-    global _running
-    _cancel_event.set()
+@huey.periodic_task(crontab(minute="*/10"))
+def requeue_stale():
+    """Re-queue videos whose consumer died mid-transcription."""
+    from app import app  # deferred: app.py imports this module
+
     with app.app_context():
-        Video.query.filter_by(status="processing").update({"status": "pending"})
-        db.session.commit()
-    with _lock:
-        _running = False
+        stale = db.session.scalars(
+            db.select(Video.id)
+            .where(Video.status == "processing", Video.updated_at < _stale_cutoff())
+        ).all()
+    for video_id in stale:
+        transcribe_one(video_id)
+
+
+def start_processing(app):
+    """Queue a transcription task for every pending video."""
+    with app.app_context():
+        pending = db.session.scalars(
+            db.select(Video.id)
+            .where(Video.status == "pending")
+            .order_by(Video.created_at)
+        ).all()
+    for video_id in pending:
+        transcribe_one(video_id)
+
+
+def stop_processing(app):
+    """Drop queued tasks and pending retries.
+
+    Videos a consumer is already working on are left as "processing" and will
+    finish; resetting them to pending would let a later start_processing()
+    claim and transcribe them a second time in parallel.
+    """
+    huey.flush()